@@ -1,16 +1,36 @@
 # app.py
+import asyncio
+import logging
+import logging.handlers
 import os
-from flask import Flask, render_template, request, jsonify
+import queue
+import time
+
+# ========================================
+# THREAD CONFIGURATION
+# ========================================
+# Set before onnxruntime/numpy are imported so OpenMP/MKL pick it up.
+# The same count is passed to the ONNX Runtime session that embeds queries.
+# With gunicorn --workers W, set TORCH_NUM_THREADS to cores / W
+# to avoid oversubscribing the CPU.
+NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+os.environ["TORCH_NUM_THREADS"] = str(NUM_THREADS)
+os.environ["OMP_NUM_THREADS"] = str(NUM_THREADS)
+os.environ["MKL_NUM_THREADS"] = str(NUM_THREADS)
+
+from quart import Quart, Response, render_template, request, jsonify
+from langchain_core.documents import Document
 from dotenv import load_dotenv
 
-# LangChain community modules
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
+# Ollama client (chat API with a separate system message)
+from ollama import AsyncClient as OllamaClient
 
 # Pinecone
-from langchain_pinecone import Pinecone as PineconeVectorStore # 1. Import the VectorStore class with an alias
 from pinecone import Pinecone as PineconeClient
 from src.prompt import system_prompt
+from src.helper import build_context, estimate_tokens, sse_event
+from src.cache import QueryCache, SemanticCache, query_key
+from src.embeddings import get_embeddings
 
 # Load environment variables
 load_dotenv()
@@ -20,10 +40,65 @@ load_dotenv()
 # ========================================
 INDEX_NAME = "medical-chatbot"
 PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
+RETRIEVAL_K = 5  # Number of documents retrieved per query
+CONTEXT_TOKEN_BUDGET = 1500  # Max (estimated) tokens of retrieved context per prompt
+
+OLLAMA_MODEL = "deepseek-r1:8b"
+OLLAMA_NUM_CTX = 4096
+OLLAMA_KEEP_ALIVE = "1h"  # Keep the model loaded between requests
 
 if not PINECONE_API_KEY:
     raise ValueError("❌ PINECONE_API_KEY not found in .env file!")
 
+# Retrieval cache (repeated questions skip embedding + Pinecone search)
+CACHE_MAX_SIZE = 2000
+CACHE_TTL_SECONDS = 600
+
+# Semantic cache (paraphrased questions reuse a previous retrieval)
+EMBEDDING_DIM = 384
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_SIZE = 5000
+
+# Static prompt segments, built once instead of per request.
+# The system prompt goes in its own message so it stays an identical
+# prefix on every call and Ollama can reuse its cached prefill.
+SYSTEM_MESSAGE = {"role": "system", "content": system_prompt}
+PROMPT_PREFIX = "Context from Medical Knowledge Base:\n"
+PROMPT_MID = "\n\nUser Question: "
+PROMPT_SUFFIX = "\n\nAnswer:"
+
+# Maximum number of requests generating with Ollama at the same time.
+# Keep it at or below what Ollama can actually run in parallel
+# (OLLAMA_NUM_PARALLEL; 1-2 for an 8B model on one GPU), extra
+# requests queue here instead of thrashing the model.
+# The limit is per server process: with W workers up to W * OLLAMA_CONCURRENCY
+# generations reach Ollama (see gunicorn.conf.py).
+try:
+    OLLAMA_CONCURRENCY = int(os.environ.get("OLLAMA_CONCURRENCY", "2"))
+except ValueError:
+    raise ValueError("❌ OLLAMA_CONCURRENCY must be a whole number (e.g. 2)!")
+
+if OLLAMA_CONCURRENCY < 1:
+    raise ValueError(f"❌ OLLAMA_CONCURRENCY must be at least 1, got {OLLAMA_CONCURRENCY}!")
+
+# Pooled keep-alive connections, enough for every to_thread worker to search at once
+PINECONE_POOL_SIZE = 32
+
+# ========================================
+# LOGGING
+# ========================================
+# Request handlers only put records on a queue; a background listener
+# thread does the actual stream I/O.
+log_queue = queue.Queue(-1)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+
+log = logging.getLogger("chat")
+log.addHandler(logging.handlers.QueueHandler(log_queue))
+log.setLevel(logging.INFO)
+log.propagate = False
+
 # ========================================
 # INITIALIZE COMPONENTS
 # ========================================
@@ -31,19 +106,20 @@ if not PINECONE_API_KEY:
 print("🔧 Initializing Medical Chatbot...")
 
 # Embeddings (same as used in store_index.py)
-print("📦 Loading embeddings model...")
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+print("📦 Loading embeddings model (ONNX int8)...")
+embeddings = get_embeddings()
 
-# Pinecone vector store
+# Pinecone index
 print("☁️  Connecting to Pinecone...")
 try:
-    docsearch = PineconeVectorStore.from_existing_index(
-        index_name=INDEX_NAME,
-        embedding=embeddings
+    # One module-level client: its keep-alive connection pool is reused
+    # by every search instead of re-doing the TLS handshake per query
+    pc = PineconeClient(api_key=PINECONE_API_KEY)
+    pinecone_index = pc.Index(
+        INDEX_NAME,
+        connection_pool_maxsize=PINECONE_POOL_SIZE  # urllib3 keep-alive connections
     )
-    retriever = docsearch.as_retriever(search_kwargs={"k": 5})
+    pinecone_index.describe_index_stats()  # Fails fast if the index is missing
     print("✅ Connected to Pinecone successfully")
 except Exception as e:
     print(f"❌ Failed to connect to Pinecone: {e}")
@@ -53,82 +129,218 @@ except Exception as e:
 # Ollama LLM
 print("🤖 Connecting to Ollama...")
 try:
-    ollama_llm = Ollama(model="deepseek-r1:8b")
+    ollama_client = OllamaClient()
     print("✅ Connected to Ollama successfully")
 except Exception as e:
     print(f"❌ Failed to connect to Ollama: {e}")
     print("💡 Make sure Ollama is running: 'ollama serve'")
-    print("💡 And model is downloaded: 'ollama pull deepseek-r1:8b'")
+    print(f"💡 And model is downloaded: 'ollama pull {OLLAMA_MODEL}'")
     raise
 
+# Retrieval caches
+query_cache = QueryCache(max_size=CACHE_MAX_SIZE, ttl_seconds=CACHE_TTL_SECONDS)
+semantic_cache = SemanticCache(
+    dim=EMBEDDING_DIM,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_size=SEMANTIC_CACHE_MAX_SIZE,
+    ttl_seconds=CACHE_TTL_SECONDS
+)
+
+# Bounds concurrent Ollama generations; other requests keep
+# embedding/searching while they wait
+LLM_SEM = asyncio.Semaphore(OLLAMA_CONCURRENCY)
+
 # ========================================
-# FLASK APP
+# QUART APP (async, served over ASGI)
 # ========================================
 
-app = Flask(__name__)
+app = Quart(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Stop reverse proxies from buffering the stream
+}
+
+
+def sse_response(events) -> Response:
+    """
+    Wrap a string or async generator of SSE events in a streaming response.
+    A single-string reply gets the closing 'done' event here; generators
+    send their own.
+    """
+    if isinstance(events, str):
+        events += sse_event("", event="done")
+    response = Response(events, mimetype="text/event-stream", headers=SSE_HEADERS)
+    # Quart's RESPONSE_TIMEOUT (60 s) would cut the stream, including the
+    # wait for LLM_SEM, so long answers are never truncated
+    response.timeout = None
+    return response
+
+
+def _to_documents(response, text_key: str = "text") -> list:
+    """Map Pinecone query matches to Documents, skipping matches without text"""
+    docs = []
+    for match in response.matches:
+        metadata = dict(match.metadata or {})
+        text = metadata.pop(text_key, None)
+        if text is None:
+            continue
+        docs.append(Document(page_content=text, metadata=metadata))
+    return docs
+
+
+async def search_pinecone(q_emb) -> list:
+    """Top RETRIEVAL_K documents for a query vector, searched off the event loop"""
+    # Pinecone's query API takes one vector per call, so concurrent searches
+    # run side by side over the shared connection pool rather than batched
+    response = await asyncio.to_thread(
+        pinecone_index.query,
+        vector=q_emb,
+        top_k=RETRIEVAL_K,
+        include_metadata=True
+    )
+    return _to_documents(response)
+
+
+async def _warmup():
+    """
+    Run one dummy embedding, Pinecone search and Ollama generation so
+    the first real user doesn't pay for model loading / connection setup.
+    """
+    log.info("🔥 Warming up models...")
+    start = time.perf_counter()
+    try:
+        q_emb = await asyncio.to_thread(embeddings.embed_query, "warmup")
+        await search_pinecone(q_emb)
+        await ollama_client.generate(
+            model=OLLAMA_MODEL,
+            prompt="ok",
+            options={"num_predict": 1, "num_ctx": OLLAMA_NUM_CTX},
+            keep_alive=OLLAMA_KEEP_ALIVE
+        )
+        log.info("✅ Warmup done in %.1fs", time.perf_counter() - start)
+    except Exception as e:
+        log.warning("⚠️  Warmup failed (first request may be slow): %s", e)
+
+
+@app.before_serving
+async def startup():
+    """Start background tasks on the server's event loop"""
+    # Started here, not at import, so each (forked) server process runs its own listener
+    log_listener.start()
+    await _warmup()
+
+
+@app.after_serving
+async def shutdown():
+    log_listener.stop()  # Flushes queued records
+
 
 @app.route("/")
-def index():
+async def index():
     """Render the chat interface"""
-    return render_template("chat.html")
+    return await render_template("chat.html")
 
 
 @app.route("/get", methods=["POST"])
-def chat():
-    """Handle chat requests"""
+async def chat():
+    """Handle chat requests, streaming the answer as Server-Sent Events"""
     try:
         # Get user message
-        user_query = request.form.get("msg")
+        form = await request.form
+        user_query = form.get("msg")
         
         if not user_query or user_query.strip() == "":
-            return "⚠️ Please enter a question"
+            return sse_response(sse_event("⚠️ Please enter a question"))
         
-        print(f"\n📨 User query: {user_query}")
+        log.info("📨 User query (len=%d)", len(user_query))
         
-        # Retrieve relevant documents from Pinecone
-        print("🔍 Searching knowledge base...")
-        docs = retriever.invoke(user_query)
+        # Check the retrieval cache before hitting Pinecone
+        cache_key = query_key(user_query)
+        cached = query_cache.get(cache_key)
         
-        if not docs:
-            return "❌ I couldn't find relevant information in the knowledge base. Please try rephrasing your question."
+        if cached is not None:
+            log.info("⚡ Cache hit: reusing %d documents", len(cached[0]))
+        else:
+            # Embed once; the vector serves both the semantic cache and Pinecone
+            # (CPU-bound, so run it off the event loop)
+            q_emb = await asyncio.to_thread(embeddings.embed_query, user_query)
+            cached = semantic_cache.get(q_emb)
+            
+            if cached is not None:
+                log.info("⚡ Semantic cache hit: reusing %d documents", len(cached[0]))
+                query_cache.put(cache_key, cached)
+            else:
+                # Retrieve relevant documents from Pinecone
+                log.info("🔍 Searching knowledge base...")
+                docs = await search_pinecone(q_emb)
+                
+                if not docs:
+                    return sse_response(sse_event("❌ I couldn't find relevant information in the knowledge base. Please try rephrasing your question."))
+                
+                # Build context from retrieved documents, capped so the
+                # prompt stays well inside Ollama's context window
+                context_text = build_context(docs, CONTEXT_TOKEN_BUDGET)
+                cached = (docs, context_text)
+                query_cache.put(cache_key, cached)
+                semantic_cache.put(q_emb, cached)
+                log.info("📚 Retrieved %d relevant documents (~%d context tokens)", len(docs), estimate_tokens(context_text))
         
-        # Build context from retrieved documents
-        context_text = "\n\n".join([doc.page_content for doc in docs])
-        print(f"📚 Retrieved {len(docs)} relevant documents")
+        docs, context_text = cached
         
-        # Build full prompt
-        full_prompt = f"""{system_prompt}
-
-Context from Medical Knowledge Base:
-{context_text}
-
-User Question: {user_query}
-
-Answer:"""
+        # Build chat messages (static system prompt + per-request context)
+        user_prompt = "".join((PROMPT_PREFIX, context_text, PROMPT_MID, user_query, PROMPT_SUFFIX))
+        messages = [SYSTEM_MESSAGE, {"role": "user", "content": user_prompt}]
         
-        # Get response from Ollama
-        print("💭 Generating response...")
-        response = ollama_llm.invoke(full_prompt)
+        async def generate():
+            # Stream tokens to the browser as Ollama produces them
+            length = 0
+            try:
+                if LLM_SEM.locked():
+                    log.info("⏳ All Ollama slots busy, waiting...")
+                async with LLM_SEM:
+                    log.info("💭 Generating response...")
+                    stream = await ollama_client.chat(
+                        model=OLLAMA_MODEL,
+                        messages=messages,
+                        options={"num_ctx": OLLAMA_NUM_CTX},
+                        keep_alive=OLLAMA_KEEP_ALIVE,
+                        stream=True
+                    )
+                    async for part in stream:
+                        chunk = part["message"]["content"]
+                        length += len(chunk)
+                        yield sse_event(chunk)
+                log.info("✅ Response generated: %d characters", length)
+            except Exception as e:
+                log.exception("❌ Error while streaming: %s", e)
+                yield sse_event(f"Sorry, an error occurred: {str(e)}", event="error")
+            yield sse_event("", event="done")
         
-        print(f"✅ Response generated: {len(response)} characters")
-        
-        return str(response)
+        return sse_response(generate())
     
     except Exception as e:
-        error_msg = f"❌ Error: {str(e)}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
-        return f"Sorry, an error occurred: {str(e)}"
+        log.exception("❌ Error: %s", e)
+        return sse_response(sse_event(f"Sorry, an error occurred: {str(e)}", event="error"))
 
 
 @app.route("/health")
-def health():
+async def health():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
         "index_name": INDEX_NAME,
-        "model": "deepseek-r1:8b"
+        "model": OLLAMA_MODEL,
+        "ollama_concurrency": OLLAMA_CONCURRENCY
+    })
+
+
+@app.route("/cache_stats")
+async def cache_stats():
+    """Retrieval cache statistics"""
+    return jsonify({
+        "exact": query_cache.stats(),
+        "semantic": semantic_cache.stats()
     })
 
 
@@ -142,7 +354,10 @@ if __name__ == "__main__":
     print("="*60)
     print(f"🌐 Open browser: http://localhost:8080")
     print(f"🔍 Using Pinecone index: {INDEX_NAME}")
-    print(f"🤖 Using Ollama model: deepseek-r1:8b")
+    print(f"🤖 Using Ollama model: {OLLAMA_MODEL}")
+    print("💡 For production run: gunicorn -c gunicorn.conf.py app:app")
     print("="*60 + "\n")
     
-    app.run(host="0.0.0.0", port=8080, debug=True)
\ No newline at end of file
+    # Development server only. No debugger/reloader: the reloader would
+    # start a second process and load all the models twice.
+    app.run(host="0.0.0.0", port=8080, debug=False, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,29 @@
+# gunicorn.conf.py
+# Production server: gunicorn -c gunicorn.conf.py app:app
+# (gunicorn is Linux/macOS only; on Windows use hypercorn, see README)
+
+bind = "0.0.0.0:8080"
+
+# The app is async (Quart/ASGI), so each worker runs an asyncio event loop
+# and one worker already serves many concurrent requests
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Everything in app.py is per process: the retrieval caches, the Ollama
+# semaphore (W workers let W * OLLAMA_CONCURRENCY generations reach Ollama)
+# and the embedding threads (keep W * TORCH_NUM_THREADS <= cores).
+# Raise this only together with those settings.
+workers = 1
+
+# No preload_app: the Pinecone client's keep-alive sockets and the ONNX
+# Runtime session are not fork-safe, so each worker builds its own after fork
+preload_app = False
+
+# For UvicornWorker this is the worker heartbeat, not a request limit (SSE
+# streams run on the event loop, which keeps the heartbeat going). The
+# heartbeat only starts once the worker is serving, so this must cover
+# importing app.py (incl. a first-run ONNX export) and the before_serving
+# warmup; export the model beforehand (see README, STEP 8) to keep it short
+timeout = 300
+
+# On restart/shutdown, give answers that are still streaming time to finish
+graceful_timeout = 120
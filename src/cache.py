@@ -0,0 +1,185 @@
+# src/cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+import faiss
+import numpy as np
+
+
+def query_key(user_query: str) -> str:
+    """
+    Build a cache key from the normalized user query.
+    Case and surrounding whitespace are ignored.
+    """
+    return hashlib.blake2b(user_query.strip().lower().encode()).hexdigest()
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL.
+    Used to skip embedding + Pinecone search for repeated questions.
+    """
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: float = 600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+@dataclass
+class CacheEntry:
+    """A cached retrieval result keyed by its query embedding."""
+    embedding: np.ndarray
+    value: Any
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SemanticCache:
+    """
+    Similarity cache over recent query embeddings.
+    A new query reuses a cached result when its cosine similarity to a
+    previous query is >= threshold, so paraphrases also hit the cache.
+    """
+
+    def __init__(
+        self,
+        dim: int = 384,
+        threshold: float = 0.95,
+        max_size: int = 5000,
+        ttl_seconds: float = 600,
+        search_k: int = 8,
+    ):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.search_k = search_k
+        self._index = faiss.IndexFlatIP(dim)
+        self._entries: List[CacheEntry] = []
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _normalize(self, embedding) -> np.ndarray:
+        # Inner product on unit vectors == cosine similarity
+        vec = np.array(embedding, dtype=np.float32).reshape(1, self.dim)
+        faiss.normalize_L2(vec)
+        return vec
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def get(self, embedding) -> Optional[Any]:
+        """Return the value cached for the most similar unexpired query, if close enough."""
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            # Look past the top match so an expired entry doesn't shadow
+            # a still-valid neighbour
+            k = min(self.search_k, self._index.ntotal)
+            scores, ids = self._index.search(vec, k)
+            now = time.monotonic()
+            value = None
+            found_expired = False
+            for score, idx in zip(scores[0], ids[0]):
+                if idx < 0 or score < self.threshold:
+                    break  # Results are sorted by score
+                entry = self._entries[idx]
+                if self._expired(entry, now):
+                    found_expired = True
+                    continue
+                value = entry.value
+                break
+
+            if found_expired:
+                self._rebuild(keep=self.max_size)
+
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, embedding, value: Any) -> None:
+        """Add a query embedding and its result to the cache."""
+        vec = self._normalize(embedding)
+        with self._lock:
+            self._index.add(vec)
+            self._entries.append(CacheEntry(embedding=vec[0], value=value))
+            if self._index.ntotal > self.max_size:
+                # Trim to 90% so the rebuild doesn't run on every put
+                self._rebuild(keep=max(1, self.max_size * 9 // 10))
+
+    def _rebuild(self, keep: int) -> None:
+        """Rebuild the index from the newest `keep` unexpired entries."""
+        now = time.monotonic()
+        survivors = [e for e in self._entries if not self._expired(e, now)][-keep:]
+
+        index = faiss.IndexFlatIP(self.dim)
+        if survivors:
+            index.add(np.stack([e.embedding for e in survivors]))
+        self._index = index
+        self._entries = survivors
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,114 @@
+# src/embeddings.py
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from onnxruntime import InferenceSession, SessionOptions
+from transformers import AutoTokenizer
+
+# ========================================
+# CONSTANTS
+# ========================================
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_MODEL_DIR = "./minilm-onnx-int8"
+ONNX_MODEL_FILE = "model_quantized.onnx"
+MAX_SEQ_LENGTH = 256  # Same limit sentence-transformers uses for MiniLM
+
+
+def export_quantized_model(model_name: str = MODEL_NAME, output_dir: str = ONNX_MODEL_DIR) -> str:
+    """
+    One-time conversion: export MiniLM to ONNX and apply dynamic int8 quantization.
+    The quantized model and tokenizer are saved to output_dir.
+    """
+    # Only needed for the export, so imported lazily
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    print(f"⚙️  Exporting {model_name} to ONNX (int8) at {output_dir}...")
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    print("✅ ONNX model exported")
+    return output_dir
+
+
+class ONNXMiniLMEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 running on ONNX Runtime with int8 weights.
+    Drop-in replacement for HuggingFaceEmbeddings (mean pooling + L2 normalize).
+    """
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_MODEL_DIR,
+        batch_size: int = 64,
+        num_threads: Optional[int] = None
+    ):
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            export_quantized_model(output_dir=model_dir)
+
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=MAX_SEQ_LENGTH,
+            return_tensors="np"
+        )
+        inputs = {
+            name: value.astype(np.int64)
+            for name, value in encoded.items()
+            if name in self._input_names
+        }
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            vectors.extend(self._embed(batch).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> Embeddings:
+    """
+    Shared embeddings model (ONNX int8 MiniLM).
+    Loaded once per process, however many modules ask for it.
+    Uses TORCH_NUM_THREADS CPU threads if set.
+    """
+    num_threads = os.environ.get("TORCH_NUM_THREADS")
+    return ONNXMiniLMEmbeddings(num_threads=int(num_threads) if num_threads else None)
@@ -0,0 +1,46 @@
+# src/helper.py
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+CHARS_PER_TOKEN = 4  # Rough average for English text
+
+
+def sse_event(text: str, event: Optional[str] = None) -> str:
+    """
+    Format text as one Server-Sent Event.
+    Every line gets its own 'data:' field so newlines inside text survive.
+    """
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in text.split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer call in the request path)."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def build_context(docs: List[Document], token_budget: int, separator: str = "\n\n") -> str:
+    """
+    Join retrieved documents in rank order, keeping the result within
+    token_budget. Lowest-ranked documents are dropped first; the document
+    that crosses the budget is cut to the space that is left.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    parts: List[str] = []
+    used = 0
+    for doc in docs:
+        if parts:
+            used += len(separator)
+        remaining = max_chars - used
+        if remaining <= 0:
+            break
+
+        text = doc.page_content
+        if len(text) > remaining:
+            parts.append(text[:remaining])
+            break
+        parts.append(text)
+        used += len(text)
+    return separator.join(parts)
@@ -0,0 +1,132 @@
+# src/text_processing.py
+import re
+from typing import List
+
+import numpy as np
+from langchain_text_splitters import TextSplitter
+
+# numba is optional: without it the pure-Python (regex) path is used
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+_CONTROL_CHARS = re.compile(r"[\x00-\x08]")
+_WHITESPACE_RUN = re.compile(r"[ \t\r\n]+")
+
+SPACE = 0x20
+NEWLINE = 0x0A
+PERIOD = 0x2E
+
+
+def _clean_python(text: str) -> str:
+    """Reference implementation of clean_text, used when numba is missing."""
+    text = _CONTROL_CHARS.sub("", text)
+    text = _WHITESPACE_RUN.sub(
+        lambda m: "\n" if ("\n" in m.group() or "\r" in m.group()) else " ",
+        text
+    )
+    return text.strip(" \t\r\n")  # Same set _clean_bytes trims
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _clean_bytes(buf):
+        """
+        Single pass over UTF-8 bytes: drop 0x00-0x08, collapse each whitespace
+        run to one newline (if it contained a line break) or one space, and
+        trim leading/trailing whitespace. Multi-byte UTF-8 sequences only use
+        bytes >= 0x80, so they pass through untouched.
+        """
+        out = np.empty(buf.size, dtype=np.uint8)
+        n = 0
+        pending = 0  # Whitespace byte to emit before the next character
+        for i in range(buf.size):
+            b = buf[i]
+            if b <= 0x08:
+                continue
+            if b == 0x20 or b == 0x09:
+                if pending == 0:
+                    pending = SPACE
+            elif b == 0x0A or b == 0x0D:
+                pending = NEWLINE
+            else:
+                if pending != 0 and n > 0:
+                    out[n] = pending
+                    n += 1
+                pending = 0
+                out[n] = b
+                n += 1
+        return out[:n]
+
+
+def clean_text(text: str) -> str:
+    """
+    Normalize extracted PDF text before chunking/embedding.
+    Removes stray control characters and collapses runs of whitespace,
+    keeping line breaks so the text splitter can still use them.
+    """
+    if not NUMBA_AVAILABLE:
+        return _clean_python(text)
+
+    buf = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    return _clean_bytes(buf).tobytes().decode("utf-8")
+
+
+def _last_point(points: np.ndarray, limit: int, floor: int) -> int:
+    """Last entry of the sorted points in (floor, limit], or -1 if there is none."""
+    i = int(np.searchsorted(points, limit, side="right")) - 1
+    return int(points[i]) if i >= 0 and points[i] > floor else -1
+
+
+class NumpyTextSplitter(TextSplitter):
+    """
+    Greedy splitter that cuts after a newline or full stop, else after a space.
+    Candidate break points come from a single vectorized NumPy scan,
+    instead of RecursiveCharacterTextSplitter's repeated per-separator passes.
+    chunk_size and chunk_overlap are counted in characters; length_function
+    is not used. The overlap is rounded forward to the next word start.
+    """
+
+    def split_text(self, text: str) -> List[str]:
+        if not text:
+            return []
+
+        # UTF-32 gives one element per character, so indices are str offsets
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        breaks = np.flatnonzero((codes == NEWLINE) | (codes == PERIOD)) + 1
+        word_starts = np.flatnonzero((codes == SPACE) | (codes == NEWLINE)) + 1
+
+        size, overlap = self._chunk_size, self._chunk_overlap
+        length = len(text)
+        chunks: List[str] = []
+        start = 0
+        while start < length:
+            limit = start + size
+            if limit >= length:
+                end = length
+            else:
+                # Last sentence/line break in (start + overlap, limit], then
+                # the last word break, else a hard cut
+                end = _last_point(breaks, limit, start + overlap)
+                if end < 0:
+                    end = _last_point(word_starts, limit, start + overlap)
+                if end < 0:
+                    end = limit
+
+            chunk = text[start:end]
+            if self._strip_whitespace:
+                chunk = chunk.strip()
+            if chunk:
+                chunks.append(chunk)
+
+            if end >= length:
+                break
+            start = end - overlap
+            if overlap:
+                # Begin the overlap at a word start rather than mid-word
+                i = int(np.searchsorted(word_starts, start, side="left"))
+                if i < word_starts.size and word_starts[i] < end:
+                    start = int(word_starts[i])
+        return chunks
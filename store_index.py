@@ -1,27 +1,38 @@
 # store_index.py
 import os
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from itertools import chain
 from typing import List
+from uuid import uuid4
 from dotenv import load_dotenv
 
 # FIXED: Use langchain_core instead of langchain.schema
 from langchain_core.documents import Document
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdfium2 import PdfDocument
 
-# Pinecone imports
-from pinecone import Pinecone as PineconeClient
-from langchain_pinecone import Pinecone as PineconeVectorStore # 1. Import the VectorStore class with an alias
+# Pinecone imports (gRPC client for faster bulk upserts)
+from pinecone import ServerlessSpec
+from pinecone.grpc import PineconeGRPC
+
+from src.embeddings import get_embeddings
+from src.text_processing import NUMBA_AVAILABLE, NumpyTextSplitter, clean_text
 
 # ========================================
 # CONSTANTS
 # ========================================
 DATA_PATH = "./data"
 INDEX_NAME = "medical-chatbot"
+EMBED_BATCH_SIZE = 64     # Chunks embedded per forward pass
+UPSERT_BATCH_SIZE = 100   # Vectors per Pinecone upsert request
+EMBEDDING_DIM = 384       # all-MiniLM-L6-v2 output size
+PDF_MIN_PAGES_PER_TASK = 16  # Smallest page range parsed by one worker task
 
 # Load environment variables
 load_dotenv()
 PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
+PINECONE_CLOUD = os.environ.get('PINECONE_CLOUD', 'aws')
+PINECONE_REGION = os.environ.get('PINECONE_REGION', 'us-east-1')
 
 if not PINECONE_API_KEY:
     raise ValueError("❌ PINECONE_API_KEY not found in .env file!")
@@ -30,37 +41,86 @@ if not PINECONE_API_KEY:
 # HELPER FUNCTIONS
 # ========================================
 
+def count_pdf_pages(path: str) -> int:
+    """Return the number of pages in a PDF."""
+    pdf = PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def extract_pdf(path: str, start: int, stop: int) -> List[Document]:
+    """
+    Extract the text of pages [start, stop) of one PDF with pypdfium2.
+    Module-level so it can run in a worker process.
+    """
+    pdf = PdfDocument(path)
+    try:
+        pages: List[Document] = []
+        for page_number in range(start, stop):
+            page = pdf[page_number]
+            textpage = page.get_textpage()
+            pages.append(
+                Document(
+                    page_content=textpage.get_text_range(),
+                    metadata={"source": path, "page": page_number}
+                )
+            )
+            textpage.close()
+            page.close()
+        return pages
+    finally:
+        pdf.close()
+
+
 def load_pdf_files(data_path: str) -> List[Document]:
     """
     Load all PDF files from the data directory.
     Each page becomes a separate Document.
+    Pages are split into ranges that are parsed in parallel worker
+    processes, so even a single large PDF uses every core.
     """
     print(f"📄 Loading PDF files from: {data_path}")
     
-    loader = DirectoryLoader(
-        data_path,
-        glob="*.pdf",
-        loader_cls=PyPDFLoader
-    )
+    pdf_paths = sorted(glob(os.path.join(data_path, "*.pdf")))
+    if not pdf_paths:
+        return []
+    
+    workers = os.cpu_count() or 1
+    
+    # Several ranges per worker keeps the pool busy if some pages are slower
+    tasks = []
+    for path in pdf_paths:
+        n_pages = count_pdf_pages(path)
+        step = max(PDF_MIN_PAGES_PER_TASK, -(-n_pages // (workers * 4)))
+        for start in range(0, n_pages, step):
+            tasks.append((path, start, min(start + step, n_pages)))
     
-    documents = loader.load()
-    print(f"✅ Loaded {len(documents)} pages from PDF(s)")
+    if not tasks:
+        return []
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        documents = list(chain.from_iterable(executor.map(extract_pdf, *zip(*tasks))))
+    
+    print(f"✅ Loaded {len(documents)} pages from {len(pdf_paths)} PDF(s)")
     return documents
 
 
 def filter_to_minimal_docs(docs: List[Document]) -> List[Document]:
     """
     Clean up metadata - keep only 'source' field.
+    Page text is normalized too (control characters, repeated whitespace).
     This reduces noise and keeps things simple.
     """
-    print("🧹 Cleaning document metadata...")
+    print(f"🧹 Cleaning document metadata and text (numba: {'on' if NUMBA_AVAILABLE else 'off'})...")
     
     minimal_docs: List[Document] = []
     for doc in docs:
         src = doc.metadata.get("source", "unknown")
         minimal_docs.append(
             Document(
-                page_content=doc.page_content,
+                page_content=clean_text(doc.page_content),
                 metadata={"source": src}
             )
         )
@@ -75,10 +135,11 @@ def text_split(minimal_docs: List[Document]) -> List[Document]:
     
     chunk_size=500: Each chunk is ~500 characters
     chunk_overlap=20: 20 characters overlap between chunks to maintain context
+    Chunks end at a newline or full stop where possible.
     """
     print("✂️  Splitting documents into chunks...")
     
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = NumpyTextSplitter(
         chunk_size=500,
         chunk_overlap=20,
     )
@@ -92,37 +153,74 @@ def create_embeddings():
     """
     Load the embedding model (runs locally, free, no API needed).
     This converts text into numerical vectors.
+    MiniLM runs on ONNX Runtime with int8 weights (exported on first use).
     """
     print("🤖 Loading embedding model...")
     
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+    embeddings = get_embeddings()
     
-    print("✅ Embedding model loaded (local, free)")
+    print("✅ Embedding model loaded (local, free, ONNX int8)")
     return embeddings
 
 
-def upload_to_pinecone(text_chunks: List[Document], embeddings, index_name: str):
+def ensure_index(pc: PineconeGRPC, index_name: str):
+    """
+    Create the Pinecone index if it doesn't exist yet.
+    Cosine metric, matching the L2-normalized MiniLM vectors.
+    """
+    if pc.has_index(index_name):
+        return
+    
+    print(f"🆕 Creating Pinecone index: {index_name}")
+    pc.create_index(
+        name=index_name,
+        dimension=EMBEDDING_DIM,
+        metric="cosine",
+        vector_type="dense",
+        spec=ServerlessSpec(cloud=PINECONE_CLOUD, region=PINECONE_REGION)
+    )
+
+
+def upload_to_pinecone(text_chunks: List[Document], embeddings, index_name: str) -> int:
     """
     Upload all chunks to Pinecone vector database.
     This is where the "magic" happens - your data becomes searchable.
+    Returns the number of vectors upserted.
     """
     print(f"☁️  Uploading to Pinecone index: {index_name}")
     print("⏳ This may take 5-15 minutes depending on data size...")
     
-    # Connect to Pinecone
-    pc = PineconeClient(api_key=PINECONE_API_KEY)
+    # Connect to Pinecone over gRPC
+    pc = PineconeGRPC(api_key=PINECONE_API_KEY)
+    ensure_index(pc, index_name)
+    index = pc.Index(index_name)
     
-    # Create vector store (automatically creates index if it doesn't exist)
-    docsearch = PineconeVectorStore.from_documents(
-        documents=text_chunks,
-        embedding=embeddings,
-        index_name=index_name
-    )
+    # Embed shortest-first so each batch pads to a similar length.
+    # Each vector keeps its own chunk's id/metadata, so the sorted
+    # order never needs to be restored.
+    order = sorted(range(len(text_chunks)), key=lambda i: len(text_chunks[i].page_content))
+    
+    vectors = []
+    for start in range(0, len(order), EMBED_BATCH_SIZE):
+        batch = [text_chunks[i] for i in order[start:start + EMBED_BATCH_SIZE]]
+        values = embeddings.embed_documents([doc.page_content for doc in batch])
+        for doc, vector in zip(batch, values):
+            vectors.append({
+                "id": str(uuid4()),
+                "values": vector,
+                "metadata": {**doc.metadata, "text": doc.page_content}
+            })
+    print(f"✅ Embedded {len(vectors)} chunks")
+    
+    # Fire all gRPC upserts asynchronously, then wait for every future
+    futures = [
+        index.upsert(vectors=vectors[start:start + UPSERT_BATCH_SIZE], async_req=True)
+        for start in range(0, len(vectors), UPSERT_BATCH_SIZE)
+    ]
+    upserted = sum(future.result().upserted_count for future in futures)
     
     print("✅ Upload complete! Your knowledge base is ready.")
-    return docsearch
+    return upserted
 
 
 # ========================================
@@ -153,12 +251,12 @@ if __name__ == "__main__":
         embeddings = create_embeddings()
         
         # Step 5: Upload to Pinecone
-        docsearch = upload_to_pinecone(text_chunks, embeddings, INDEX_NAME)
+        upserted = upload_to_pinecone(text_chunks, embeddings, INDEX_NAME)
         
         print("\n" + "="*60)
         print("🎉 SUCCESS! Knowledge base is ready!")
         print("="*60)
-        print(f"📊 Total chunks indexed: {len(text_chunks)}")
+        print(f"📊 Total chunks indexed: {upserted}")
         print(f"🔍 Index name: {INDEX_NAME}")
         print("\n💡 Next step: Run 'python app.py' to start the chatbot\n")
         
@@ -170,4 +268,4 @@ if __name__ == "__main__":
         print("1. Check if Medical_book.pdf exists in ./data folder")
         print("2. Verify PINECONE_API_KEY in .env file")
         print("3. Make sure venv is activated")
-        print("4. Try: pip install pypdf PyPDF2 langchain-core")
\ No newline at end of file
+        print("4. Try: pip install pypdfium2 langchain-core")
\ No newline at end of file